@@ -43,11 +43,15 @@ import socket
 import platform
 import subprocess
 import time
+import asyncio
 from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
-from datetime import datetime, timedelta
+import orjson
+from datetime import datetime, timedelta, date
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 import re
@@ -57,23 +61,58 @@ from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import logging
 from logging.handlers import RotatingFileHandler
-from database import db, Note, Ticket, WorkflowExecution, init_db
+from database import db, Note, Ticket, WorkflowExecution, init_db, save_notes_bulk, save_tickets_bulk
 from queue import Queue, Empty
+from collections import deque
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
-# 智谱AI API
-import sseclient
+from sqlalchemy.exc import OperationalError
+# 智谱AI API（异步调用）
+import aiohttp
 # 小红书 MCP 客户端
-from mcp_client import XiaohongshuMCPClient
+from mcp_client import search_xiaohongshu
 # AI 提示词配置
-from prompts import get_keyword_optimization_prompt, get_ticket_analysis_prompt
+from prompts import (
+    get_keyword_optimization_prompt,
+    get_ticket_analysis_prompt,
+    get_batch_ticket_analysis_prompt,
+)
 
-# 创建数据库写入锁
-db_lock = Lock()
+# SSE 客户端注册表：每个客户端持有独立的有界队列、task_update 合并表和唤醒事件，
+# 广播为 O(1) 追加，慢客户端只会丢自己最旧的消息，不会拖垮其他客户端。
+# task_update 按 task_id 只保留最新状态，由生成器以 200ms 粒度统一下发，
+# 搜索高峰期每任务多次的状态推送被合并成一条
+_sse_clients = []
+_sse_clients_lock = threading.Lock()
+SSE_CLIENT_QUEUE_SIZE = 1000
+SSE_FLUSH_INTERVAL = 0.2
+SSE_HEARTBEAT_INTERVAL = 30
 
-# 创建事件队列
-event_queue = Queue()
+# 数据库写入队列（单写者模式，批量提交）
+write_queue = Queue()
+
+# 已知笔记/票务 ID 缓存，启动时预热，之后随插入、删除同步维护，
+# 用于替代逐条存在性 SELECT（内存成本约 40 字节/ID，远低于查询开销）
+_known_note_ids = set()
+_known_ticket_note_ids = set()
+_known_ids_lock = threading.Lock()
+
+# asyncio.run 每次新建一个事件循环；gevent 部署下所有请求和调度 greenlet
+# 共享同一个 OS 线程，两个 pipeline 重叠时第二个 asyncio.run 会撞上
+# 第一个还没退出的循环（RuntimeError: cannot be called from a running
+# event loop）。用锁把 pipeline 级别串行化：等待方 greenlet 挂起让出，
+# 持有方的循环继续推进；单个 pipeline 内部的并发 fan-out 不受影响。
+# 普通多线程部署下锁同样正确，只是基本不会竞争
+_feed_pipeline_lock = threading.Lock()
+
+
+def run_feed_pipeline(coro):
+    """串行执行一个 asyncio 笔记处理 pipeline（同一 OS 线程不能嵌套事件循环）"""
+    with _feed_pipeline_lock:
+        return asyncio.run(coro)
+
+# 批量写入参数：每批最多记录数 / 攒批时间窗口（秒）
+DB_WRITE_BATCH_SIZE = 200
+DB_WRITE_TICK = 0.05
 
 # 创建扩展对象
 cache = Cache()
@@ -111,23 +150,48 @@ def create_app():
 # 创建应用实例
 app = create_app()
 
-def _create_zhipu_client(stream_response):
-    """将流式响应包装为可迭代对象"""
-    return sseclient.SSEClient(stream_response)
+# 单次搜索内 AI 分析的最大并发数
+AI_CONCURRENCY = 20
+
+# 批量分析时单次请求携带的笔记数（批次过大会降低模型输出质量）
+AI_BATCH_SIZE = 20
+
+# 从模型输出中提取 JSON 块，单次扫描并兼容"以下是JSON：{...}"这类前后缀
+_JSON_BLOCK_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+# 智谱 API 同步调用共用的连接池：复用 TLS 连接，瞬时错误自动重试
+_zhipu_session = requests.Session()
+_zhipu_session.mount('https://', HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504])
+))
 
 # 监控类
 class Monitor:
+    # 统一调度 tick 的扫描间隔（秒）
+    TICK_SECONDS = 5
+
     def __init__(self):
         self.keywords = set()
         self.is_running = False
         self.scheduler = BackgroundScheduler()
-        self.task_jobs = {}  # 存储任务ID到job_id的映射
+        self.scheduled_tasks = {}  # 任务ID -> 搜索关键词
+
 
-        
     def start(self):
         """启动监控"""
         if not self.is_running:
             self.is_running = True
+            # 单个调度 job 扫描所有到期任务，N 个任务共享一个调度线程
+            self.scheduler.add_job(
+                self._run_due_tasks,
+                'interval',
+                seconds=self.TICK_SECONDS,
+                id='task_tick',
+                coalesce=True,
+                max_instances=1
+            )
             # 启动调度器
             self.scheduler.start()
             # 恢复所有启用定时任务的工作流
@@ -139,6 +203,27 @@ class Monitor:
                 for task in active_tasks:
                     self.add_task_schedule(task.id, task.msg, task.schedule_interval)
             app.logger.info("监控服务已启动")
+
+    def _run_due_tasks(self):
+        """扫描到期任务并按关键词分组合并执行（同关键词只搜索一次）"""
+        groups = {}
+        with app.app_context():
+            # 只扫运行中的任务：暂停任务的 next_run_at 不再前移，
+            # 不过滤的话它们会在每个 tick 被重复选出并跳过
+            due_tasks = WorkflowExecution.query.filter(
+                WorkflowExecution.is_scheduled.is_(True),
+                WorkflowExecution.status == 'running',
+                WorkflowExecution.next_run_at <= datetime.utcnow()
+            ).all()
+            for task in due_tasks:
+                keyword = self.scheduled_tasks.get(task.id) or task.msg
+                groups.setdefault(keyword, []).append(task.id)
+
+        for keyword, task_ids in groups.items():
+            try:
+                execute_scheduled_tasks(task_ids, keyword)
+            except Exception as e:
+                app.logger.error(f"定时任务组执行失败 ({keyword}): {str(e)}")
             
     def stop(self):
         """停止监控"""
@@ -159,218 +244,200 @@ class Monitor:
             app.logger.info(f"已移除监控关键词: {keyword}")
     
     def add_task_schedule(self, task_id, keyword, interval_seconds=60):
-        """为任务添加定时执行"""
-        job_id = f"task_{task_id}"
-        
-        # 如果任务已存在，先移除
-        if job_id in self.task_jobs:
-            try:
-                self.scheduler.remove_job(job_id)
-            except:
-                pass
-        
-        # 添加新的定时任务
-        self.scheduler.add_job(
-            execute_scheduled_task,
-            'interval',
-            seconds=interval_seconds,
-            id=job_id,
-            args=[task_id, keyword],
-            replace_existing=True
-        )
-        
-        self.task_jobs[task_id] = job_id
-        
+        """为任务添加定时执行（由统一的调度 tick 驱动，只需登记并设置下次执行时间）"""
+        self.scheduled_tasks[task_id] = keyword
+
         # 更新下次执行时间
         with app.app_context():
             task = WorkflowExecution.query.get(task_id)
             if task:
+                task.schedule_interval = interval_seconds
                 task.next_run_at = datetime.utcnow() + timedelta(seconds=interval_seconds)
                 db.session.commit()
-        
+
         app.logger.info(f"已为任务 {task_id} ({keyword}) 添加定时任务，间隔 {interval_seconds} 秒")
-    
+
     def pause_task_schedule(self, task_id):
-        """暂停任务定时执行"""
-        job_id = f"task_{task_id}"
-        
-        if job_id in self.task_jobs:
-            try:
-                self.scheduler.pause_job(job_id)
-                app.logger.info(f"已暂停任务 {task_id} 的定时执行")
-                
-                # 更新数据库状态
-                with app.app_context():
-                    task = WorkflowExecution.query.get(task_id)
-                    if task:
-                        task.status = 'paused'
-                        db.session.commit()
-                return True
-            except Exception as e:
-                app.logger.error(f"暂停任务失败: {str(e)}")
-                return False
-        return False
-    
+        """暂停任务定时执行
+
+        以数据库为准判断任务是否存在：scheduled_tasks 只是本进程的关键词
+        缓存，多 worker 部署下请求可能落在没登记该任务的 worker 上
+        """
+        try:
+            # 更新数据库状态，调度 tick 会跳过非 running 任务
+            with app.app_context():
+                task = WorkflowExecution.query.get(task_id)
+                if task is None or not task.is_scheduled:
+                    return False
+                task.status = 'paused'
+                db.session.commit()
+            app.logger.info(f"已暂停任务 {task_id} 的定时执行")
+            return True
+        except Exception as e:
+            app.logger.error(f"暂停任务失败: {str(e)}")
+            return False
+
     def resume_task_schedule(self, task_id):
-        """恢复任务定时执行"""
-        job_id = f"task_{task_id}"
-        
-        if job_id in self.task_jobs:
-            try:
-                self.scheduler.resume_job(job_id)
-                app.logger.info(f"已恢复任务 {task_id} 的定时执行")
-                
-                # 更新数据库状态
-                with app.app_context():
-                    task = WorkflowExecution.query.get(task_id)
-                    if task:
-                        task.status = 'running'
-                        db.session.commit()
-                return True
-            except Exception as e:
-                app.logger.error(f"恢复任务失败: {str(e)}")
-                return False
-        return False
-            
+        """恢复任务定时执行（同 pause，以数据库行为准）"""
+        try:
+            # 更新数据库状态
+            with app.app_context():
+                task = WorkflowExecution.query.get(task_id)
+                if task is None or not task.is_scheduled:
+                    return False
+                task.status = 'running'
+                task.next_run_at = datetime.utcnow() + timedelta(seconds=task.schedule_interval or 60)
+                db.session.commit()
+            app.logger.info(f"已恢复任务 {task_id} 的定时执行")
+            return True
+        except Exception as e:
+            app.logger.error(f"恢复任务失败: {str(e)}")
+            return False
+
     def remove_task_schedule(self, task_id):
-        """移除任务定时执行"""
-        job_id = f"task_{task_id}"
-        
-        if job_id in self.task_jobs:
-            try:
-                self.scheduler.remove_job(job_id)
-                del self.task_jobs[task_id]
-                app.logger.info(f"已移除任务 {task_id} 的定时任务")
-                
-                # 更新数据库状态
-                with app.app_context():
-                    task = WorkflowExecution.query.get(task_id)
-                    if task:
-                        task.is_scheduled = False
-                        task.status = 'stopped'
-                        db.session.commit()
-                return True
-            except Exception as e:
-                app.logger.error(f"移除任务失败: {str(e)}")
-                return False
-        return False
+        """移除任务定时执行（同 pause，以数据库行为准）"""
+        try:
+            self.scheduled_tasks.pop(task_id, None)
+
+            # 更新数据库状态
+            with app.app_context():
+                task = WorkflowExecution.query.get(task_id)
+                if task is None or not task.is_scheduled:
+                    return False
+                task.is_scheduled = False
+                task.status = 'stopped'
+                db.session.commit()
+            app.logger.info(f"已移除任务 {task_id} 的定时任务")
+            return True
+        except Exception as e:
+            app.logger.error(f"移除任务失败: {str(e)}")
+            return False
 
 # 创建监控实例
 monitor = Monitor()
 
-def execute_scheduled_task(task_id, keyword):
-    """定时执行任务"""
-    app.logger.info(f"定时任务触发: 任务ID={task_id}, 关键词={keyword}")
-    
+def mcp_search_feeds(keyword, **kwargs):
+    """通过共享 MCP 客户端搜索小红书内容（mcp_client 模块按 URL 维护单例，
+    复用已握手的会话和连接池，失效时自动重连一次后重试）"""
+    return search_xiaohongshu(keyword, mcp_url=app.config['MCP_XIAOHONGSHU_URL'], **kwargs)
+
+def execute_scheduled_tasks(task_ids, keyword):
+    """合并执行一组同关键词的到期定时任务：关键词优化和搜索只做一次"""
+    app.logger.info(f"定时任务触发: 任务ID={task_ids}, 关键词={keyword}")
+
     with app.app_context():
-        # 获取任务
-        task = WorkflowExecution.query.get(task_id)
-        if not task:
-            app.logger.error(f"任务不存在: {task_id}")
-            return
-        
-        # 检查任务状态
-        if task.status not in ['running', 'paused']:
-            app.logger.info(f"任务状态为 {task.status}，跳过执行")
-            return
-        
-        if task.status == 'paused':
-            app.logger.info(f"任务已暂停，跳过执行")
+        # 获取任务并筛选可执行的
+        tasks = WorkflowExecution.query.filter(WorkflowExecution.id.in_(task_ids)).all()
+        runnable = []
+        for task in tasks:
+            # 只有 running 状态的任务可执行（paused 任务在此一并跳过）
+            if task.status != 'running':
+                app.logger.info(f"任务状态为 {task.status}，跳过执行")
+                continue
+
+            # 更新执行信息
+            task.last_run_at = datetime.utcnow()
+            task.run_count = (task.run_count or 0) + 1
+            task.next_run_at = datetime.utcnow() + timedelta(seconds=task.schedule_interval)
+            task.message = f"第 {task.run_count} 次定时执行"
+            runnable.append(task)
+
+        if not runnable:
             return
-        
-        # 更新执行信息
-        task.last_run_at = datetime.utcnow()
-        task.run_count = (task.run_count or 0) + 1
-        task.next_run_at = datetime.utcnow() + timedelta(seconds=task.schedule_interval)
-        task.message = f"第 {task.run_count} 次定时执行"
+
         db.session.commit()
-        
+
         # 通知前端任务状态更新
-        notify_clients('task_update', {
-            'task_id': task_id,
-            'status': 'running',
-            'message': task.message,
-            'run_count': task.run_count,
-            'last_run_at': task.last_run_at.isoformat() if task.last_run_at else None,
-            'next_run_at': task.next_run_at.isoformat() if task.next_run_at else None
-        })
-        
+        for task in runnable:
+            notify_clients('task_update', {
+                'task_id': task.id,
+                'status': 'running',
+                'message': task.message,
+                'run_count': task.run_count,
+                'last_run_at': task.last_run_at.isoformat() if task.last_run_at else None,
+                'next_run_at': task.next_run_at.isoformat() if task.next_run_at else None
+            })
+
         # 执行搜索
         app.logger.info(f"开始执行定时搜索，关键词: {keyword}")
-        
+
         try:
-            # 优化关键词
+            # 优化关键词（有缓存）
             optimized_keyword = optimize_search_keyword(keyword)
             app.logger.info(f"优化后的关键词: {optimized_keyword}")
-            
+
             # 通知前端
-            notify_clients('task_update', {
-                'task_id': task_id,
-                'status': 'running',
-                'message': f'正在搜索小红书内容（{optimized_keyword}）...'
-            })
-            
-            # 调用小红书MCP服务
-            with XiaohongshuMCPClient(app.config['MCP_XIAOHONGSHU_URL']) as client:
-                feeds = client.search_feeds(optimized_keyword, sort_by="最新")
-            
+            for task in runnable:
+                notify_clients('task_update', {
+                    'task_id': task.id,
+                    'status': 'running',
+                    'message': f'正在搜索小红书内容（{optimized_keyword}）...'
+                })
+
+            # 调用小红书MCP服务（复用共享客户端，整组只搜索一次）
+            feeds = mcp_search_feeds(optimized_keyword, sort_by="最新")
+
             app.logger.info(f"定时任务搜索成功，找到 {len(feeds)} 条笔记")
-            
+
             # 通知前端
-            notify_clients('task_update', {
-                'task_id': task_id,
-                'status': 'running',
-                'message': f'找到 {len(feeds)} 条笔记，正在分析...'
-            })
-            
-            # 并发处理笔记
+            for task in runnable:
+                notify_clients('task_update', {
+                    'task_id': task.id,
+                    'status': 'running',
+                    'message': f'找到 {len(feeds)} 条笔记，正在分析...'
+                })
+
+            # 并发处理笔记（挂在组内第一个任务名下）
             ticket_count = 0
-            with ThreadPoolExecutor(max_workers=5) as executor:
-                future_to_feed = {
-                    executor.submit(process_single_feed, feed, task_id): feed 
-                    for feed in feeds
-                }
-                
-                for future in as_completed(future_to_feed):
-                    try:
-                        result = future.result()
-                        if result['success'] and result.get('is_ticket'):
-                            ticket_count += 1
-                            app.logger.info(f"发现新票务: {result.get('event_name')}")
-                    except Exception as e:
-                        app.logger.error(f"处理笔记失败: {str(e)}")
-            
+
+            def _on_feed_result(result):
+                nonlocal ticket_count
+                if result.get('success') and result.get('is_ticket'):
+                    ticket_count += 1
+                    app.logger.info(f"发现新票务: {result['ticket']['event_name']}")
+
+            run_feed_pipeline(_process_feeds_async(feeds, runnable[0].id, _on_feed_result))
+
             # 更新任务消息
-            task.message = f"第 {task.run_count} 次执行完成，发现 {ticket_count} 条新票务"
+            for task in runnable:
+                task.message = f"第 {task.run_count} 次执行完成，发现 {ticket_count} 条新票务"
             db.session.commit()
-            
+
             # 通知前端
-            notify_clients('task_update', {
-                'task_id': task_id,
-                'status': 'running',
-                'message': task.message
-            })
-            
-            app.logger.info(f"定时任务执行完成: 任务ID={task_id}, 新票务={ticket_count}")
-            
+            for task in runnable:
+                notify_clients('task_update', {
+                    'task_id': task.id,
+                    'status': 'running',
+                    'message': task.message
+                })
+
+            app.logger.info(f"定时任务执行完成: 任务ID={task_ids}, 新票务={ticket_count}")
+
         except Exception as e:
             app.logger.error(f"定时任务执行失败: {str(e)}")
-            task.message = f"执行失败: {str(e)}"
+            for task in runnable:
+                task.message = f"执行失败: {str(e)}"
             db.session.commit()
-            
-            notify_clients('task_update', {
-                'task_id': task_id,
-                'status': 'running',
-                'message': task.message
-            })
 
-def analyze_ticket_content(note_desc):
-    """使用智谱AI分析笔记内容中的票务信息"""
+            for task in runnable:
+                notify_clients('task_update', {
+                    'task_id': task.id,
+                    'status': 'running',
+                    'message': task.message
+                })
+
+async def analyze_ticket_content_async(session, note_desc):
+    """使用智谱AI分析笔记内容中的票务信息（异步版本）
+
+    Args:
+        session: 共享的 aiohttp.ClientSession
+        note_desc: 笔记内容
+    """
     app.logger.info(f"开始分析笔记内容: {note_desc}")
-    
+
     # 使用统一的提示词配置
     prompt = get_ticket_analysis_prompt(note_desc)
-    
+
     try:
         app.logger.info("开始调用智谱AI API")
         headers = {
@@ -386,48 +453,38 @@ def analyze_ticket_content(note_desc):
                 }
             ],
             "temperature": 0.1,
-            "stream": True
+            "stream": False,
+            "response_format": {"type": "json_object"}
         }
 
-        response = requests.post(
+        async with session.post(
             "https://open.bigmodel.cn/api/paas/v4/chat/completions",
             headers=headers,
             json=payload,
-            stream=True,
-            timeout=60
-        )
+            timeout=aiohttp.ClientTimeout(total=60)
+        ) as response:
 
-        if response.status_code != 200:
-            app.logger.error(f"智谱AI API调用失败: {response.status_code}, {response.text}")
-            return {"is_ticket_resale": False}
-
-        sse_client = _create_zhipu_client(response)
-        full_text = ""
-        for event in sse_client.events():
-            if event.data:
-                try:
-                    event_data = json.loads(event.data)
-                except json.JSONDecodeError:
-                    continue
+            if response.status != 200:
+                body = await response.text()
+                app.logger.error(f"智谱AI API调用失败: {response.status}, {body}")
+                return {"is_ticket_resale": False}
 
-                delta = event_data.get("choices", [{}])[0].get("delta", {})
-                if isinstance(delta, dict) and "content" in delta:
-                    full_text += delta["content"]
+            # 调用方不消费增量输出，直接一次性解码完整响应
+            data = orjson.loads(await response.read())
 
+        full_text = data.get("choices", [{}])[0].get("message", {}).get("content", "")
         app.logger.info(f"智谱AI API响应: {full_text}")
 
         try:
-            json_start = full_text.find('{')
-            json_end = full_text.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                json_str = full_text[json_start:json_end]
-                result = json.loads(json_str)
+            m = _JSON_BLOCK_RE.search(full_text)
+            if m:
+                result = orjson.loads(m.group(0))
                 app.logger.info(f"解析票务信息结果: {json.dumps(result, ensure_ascii=False)}")
                 return result
             else:
                 app.logger.error("未找到JSON数据")
                 return {"is_ticket_resale": False}
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             app.logger.error(f"解析JSON失败: {str(e)}, 原文: {full_text}")
             return {"is_ticket_resale": False}
             
@@ -436,28 +493,29 @@ def analyze_ticket_content(note_desc):
         return {"is_ticket_resale": False}
 
 
-def optimize_search_keyword(original_keyword):
+async def analyze_ticket_content_batch_async(session, descriptions):
     """
-    使用大模型优化搜索关键词
-    分析用户意图，提取核心搜索词
-    
+    一次请求批量分析多条笔记内容，摊薄每条笔记的 HTTP/TLS/prefill 开销
+
     Args:
-        original_keyword: 原始关键词
-        
+        session: 共享的 aiohttp.ClientSession
+        descriptions: 笔记内容列表
+
     Returns:
-        优化后的关键词
+        list: 与输入顺序一一对应的票务分析结果
     """
-    app.logger.info(f"开始优化搜索关键词: {original_keyword}")
-    
+    fallback = [{"is_ticket_resale": False} for _ in descriptions]
+    if not descriptions:
+        return []
+
+    app.logger.info(f"开始批量分析 {len(descriptions)} 条笔记内容")
+    prompt = get_batch_ticket_analysis_prompt(descriptions)
+
     try:
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {app.config['ZHIPU_API_KEY']}"
         }
-        
-        # 使用统一的提示词配置
-        prompt = get_keyword_optimization_prompt(original_keyword)
-
         payload = {
             "model": "glm-4-flash",
             "messages": [
@@ -466,44 +524,348 @@ def optimize_search_keyword(original_keyword):
                     "content": prompt
                 }
             ],
-            "temperature": 0.3,
-            "stream": False
+            "temperature": 0.1,
+            "stream": False,
+            "response_format": {"type": "json_object"}
         }
 
-        response = requests.post(
+        async with session.post(
             "https://open.bigmodel.cn/api/paas/v4/chat/completions",
             headers=headers,
             json=payload,
-            timeout=30
-        )
+            timeout=aiohttp.ClientTimeout(total=120)
+        ) as response:
 
-        if response.status_code != 200:
-            app.logger.error(f"关键词优化 API 调用失败: {response.status_code}, {response.text}")
-            return original_keyword
+            if response.status != 200:
+                body = await response.text()
+                app.logger.error(f"智谱AI API调用失败: {response.status}, {body}")
+                return fallback
 
-        result = response.json()
-        optimized_keyword = result.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
-        
-        if not optimized_keyword:
-            app.logger.warning("关键词优化返回空结果，使用原始关键词")
-            return original_keyword
-            
+            data = orjson.loads(await response.read())
+
+        full_text = data.get("choices", [{}])[0].get("message", {}).get("content", "")
+
+        m = _JSON_BLOCK_RE.search(full_text)
+        if not m:
+            app.logger.error("批量分析未找到JSON数据")
+            return fallback
+
+        parsed = orjson.loads(m.group(0))
+        results = parsed.get('results', []) if isinstance(parsed, dict) else parsed
+
+        # 对齐结果数量，模型偶尔会漏掉或多出条目
+        results = [r if isinstance(r, dict) else {"is_ticket_resale": False}
+                   for r in results[:len(descriptions)]]
+        results += [{"is_ticket_resale": False}] * (len(descriptions) - len(results))
+        return results
+
+    except Exception as e:
+        app.logger.error(f"批量分析调用AI服务出错: {str(e)}")
+        return fallback
+
+
+async def _process_feeds_batched(feeds, workflow_execution_id, on_result=None):
+    """
+    批量处理 feeds：先统一去重并入队笔记，再按批次调用 AI 分析
+
+    Args:
+        feeds: feed 列表
+        workflow_execution_id: 工作流执行 ID
+        on_result: 可选回调，每个 feed 处理完成时调用
+
+    Returns:
+        list: 各个 feed 的处理结果
+    """
+    ensure_db_writer()
+    results = []
+
+    def _emit(result):
+        results.append(result)
+        if on_result:
+            on_result(result)
+
+    # 第一步：过滤、去重并入队笔记，收集待分析内容
+    pending = []  # (feed_id, description, note_url)
+    for feed in feeds:
+        if feed.get('modelType') != 'note':
+            _emit({'success': False, 'reason': 'not_note_type'})
+            continue
+
+        feed_id = feed.get('id')
+        note_card = feed.get('noteCard', {})
+        if not feed_id or not note_card:
+            _emit({'success': False, 'reason': 'incomplete_data'})
+            continue
+
+        with _known_ids_lock:
+            if feed_id in _known_note_ids:
+                already_exists = True
+            else:
+                _known_note_ids.add(feed_id)
+                already_exists = False
+        if already_exists:
+            app.logger.info(f"笔记已存在，跳过: {feed_id}")
+            _emit({'success': False, 'reason': 'already_exists', 'note_id': feed_id})
+            continue
+
+        note_url = f"https://www.xiaohongshu.com/explore/{feed_id}"
+        description = note_card.get('displayTitle', '')
+
+        write_queue.put({
+            'type': 'note',
+            'data': {
+                'note_id': feed_id,
+                'description': description,
+                'note_url': note_url,
+                'create_time': datetime.now()
+            }
+        })
+        pending.append((feed_id, description, note_url))
+
+    # 第二步：按批次并发调用 AI，结果与 feed 按顺序对应
+    if pending:
+        batches = [pending[i:i + AI_BATCH_SIZE] for i in range(0, len(pending), AI_BATCH_SIZE)]
+
+        async with aiohttp.ClientSession() as session:
+
+            async def _analyze_batch(batch):
+                infos = await analyze_ticket_content_batch_async(
+                    session, [description for _, description, _ in batch])
+                return batch, infos
+
+            for future in asyncio.as_completed([_analyze_batch(b) for b in batches]):
+                batch, infos = await future
+                for (feed_id, _, note_url), ticket_info in zip(batch, infos):
+                    try:
+                        _emit(_record_ticket_result(feed_id, note_url, ticket_info))
+                    except Exception as e:
+                        app.logger.error(f"处理批量分析结果失败: {str(e)}")
+                        _emit({'success': False, 'reason': 'error', 'error': str(e)})
+
+    return results
+
+
+@cache.memoize(timeout=3600)
+def _optimize_search_keyword_cached(original_keyword):
+    """调用大模型优化关键词；失败时抛出异常，避免把原始关键词污染进缓存"""
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {app.config['ZHIPU_API_KEY']}"
+    }
+
+    # 使用统一的提示词配置
+    prompt = get_keyword_optimization_prompt(original_keyword)
+
+    payload = {
+        "model": "glm-4-flash",
+        "messages": [
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "temperature": 0.3,
+        "stream": False
+    }
+
+    response = _zhipu_session.post(
+        "https://open.bigmodel.cn/api/paas/v4/chat/completions",
+        headers=headers,
+        json=payload,
+        timeout=30
+    )
+
+    if response.status_code != 200:
+        raise RuntimeError(f"关键词优化 API 调用失败: {response.status_code}, {response.text}")
+
+    result = response.json()
+    optimized_keyword = result.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
+
+    if not optimized_keyword:
+        raise RuntimeError("关键词优化返回空结果")
+
+    return optimized_keyword
+
+
+def optimize_search_keyword(original_keyword):
+    """
+    使用大模型优化搜索关键词
+    分析用户意图，提取核心搜索词
+
+    结果按关键词缓存 1 小时：定时任务每 60 秒用同一关键词执行，
+    无需每次都调用一遍大模型
+
+    Args:
+        original_keyword: 原始关键词
+
+    Returns:
+        优化后的关键词
+    """
+    app.logger.info(f"开始优化搜索关键词: {original_keyword}")
+
+    try:
+        optimized_keyword = _optimize_search_keyword_cached(original_keyword)
         app.logger.info(f"关键词优化成功: '{original_keyword}' -> '{optimized_keyword}'")
         return optimized_keyword
-        
     except Exception as e:
         app.logger.error(f"关键词优化失败: {str(e)}，使用原始关键词")
         return original_keyword
 
 
-def process_single_feed(feed, workflow_execution_id):
+def _commit_with_retry(max_retries=5):
+    """提交事务，遇到 SQLite 写锁冲突时指数退避重试（上限与 busy_timeout 一致）"""
+    delay = 0.05
+    for attempt in range(max_retries):
+        try:
+            db.session.commit()
+            return
+        except OperationalError as e:
+            if 'database is locked' not in str(e) or attempt == max_retries - 1:
+                raise
+            db.session.rollback()
+            time.sleep(delay)
+            delay = min(delay * 2, 5.0)
+
+
+def db_writer_loop():
+    """单写者线程：批量落库，把每搜索 2N 次 fsync 压缩为每批一次"""
+    with app.app_context():
+        # 预热已知笔记 / 票务 ID 缓存
+        with _known_ids_lock:
+            for (note_id,) in db.session.query(Note.note_id).all():
+                _known_note_ids.add(note_id)
+            for (note_id,) in db.session.query(Ticket.note_id).all():
+                _known_ticket_note_ids.add(note_id)
+        app.logger.info(
+            f"数据库写入线程已启动，已缓存 {len(_known_note_ids)} 个笔记 ID、"
+            f"{len(_known_ticket_note_ids)} 个票务笔记 ID"
+        )
+
+        while True:
+            try:
+                record = write_queue.get(timeout=DB_WRITE_TICK)
+            except Empty:
+                continue
+
+            # 攒一批再提交
+            batch = [record]
+            while len(batch) < DB_WRITE_BATCH_SIZE:
+                try:
+                    batch.append(write_queue.get_nowait())
+                except Empty:
+                    break
+
+            # worker 入队前已通过缓存集合原子去重；INSERT OR IGNORE 把兜底去重
+            # 下推到存储引擎，省掉 ORM 对象构建和插入前探测
+            notes = [item['data'] for item in batch if item['type'] == 'note']
+            tickets = [item['data'] for item in batch if item['type'] == 'ticket']
+
+            if not notes and not tickets:
+                continue
+
+            try:
+                save_notes_bulk(notes, commit=False)
+                save_tickets_bulk(tickets, commit=False)
+                _commit_with_retry()
+            except Exception as e:
+                app.logger.error(f"批量写入数据库失败: {str(e)}")
+                db.session.rollback()
+                # 这批 ID 在入队时已经在缓存集合里占了位，写入失败必须释放，
+                # 否则后续搜索会把它们当成已落库而永远丢弃
+                with _known_ids_lock:
+                    _known_note_ids.difference_update(n['note_id'] for n in notes)
+                    _known_ticket_note_ids.difference_update(t['note_id'] for t in tickets)
+
+
+_db_writer_started = False
+_db_writer_lock = threading.Lock()
+
+
+def ensure_db_writer():
+    """确保数据库写入线程已启动（幂等）"""
+    global _db_writer_started
+    if _db_writer_started:
+        return
+    with _db_writer_lock:
+        if not _db_writer_started:
+            threading.Thread(target=db_writer_loop, name='db-writer', daemon=True).start()
+            _db_writer_started = True
+
+
+def _parse_event_date(s):
+    """解析 YYYY-MM-DD 格式的演出日期；切片取整避免 strptime 每次重建格式解析器"""
+    if not s or len(s) < 10:
+        return None
+    try:
+        return date(int(s[0:4]), int(s[5:7]), int(s[8:10]))
+    except ValueError:
+        return None
+
+
+def _record_ticket_result(feed_id, note_url, ticket_info):
+    """根据 AI 分析结果入队票务信息并构建处理结果"""
+    if not ticket_info.get('is_ticket_resale'):
+        # 非票务信息，笔记已交给写入线程
+        return {'success': True, 'is_ticket': False, 'note_id': feed_id}
+
+    # 检查该笔记是否已有票务信息（缓存集合替代 SELECT）
+    with _known_ids_lock:
+        if feed_id in _known_ticket_note_ids:
+            ticket_exists = True
+        else:
+            _known_ticket_note_ids.add(feed_id)
+            ticket_exists = False
+    if ticket_exists:
+        app.logger.warning(f"票务信息已存在，跳过: {feed_id}")
+        return {'success': False, 'reason': 'ticket_exists', 'note_id': feed_id}
+
+    event_date = _parse_event_date(ticket_info.get('event_date'))
+
+    # 票务信息同样交给写入线程批量落库
+    write_queue.put({
+        'type': 'ticket',
+        'data': {
+            'note_id': feed_id,
+            'is_ticket_resale': ticket_info.get('is_ticket_resale', True),
+            'event_name': ticket_info.get('event_name', ''),
+            'city': ticket_info.get('city', ''),
+            'event_date': event_date,
+            'area': ticket_info.get('area', ''),
+            'price': ticket_info.get('price', ''),
+            'quantity': ticket_info.get('quantity', ''),
+            'contact': ticket_info.get('contact', ''),
+            'notes': ticket_info.get('notes', '')
+        }
+    })
+
+    app.logger.info(f"已提交票务入库: {ticket_info.get('event_name', '')} - {ticket_info.get('city', '')}")
+
+    return {
+        'success': True,
+        'is_ticket': True,
+        'ticket': {
+            'event_name': ticket_info.get('event_name', ''),
+            'city': ticket_info.get('city', ''),
+            'event_date': event_date.strftime('%Y-%m-%d') if event_date else None,
+            'price': ticket_info.get('price', ''),
+            'area': ticket_info.get('area', ''),
+            'quantity': ticket_info.get('quantity', ''),
+            'contact': ticket_info.get('contact', ''),
+            'notes': ticket_info.get('notes', ''),
+            'note_url': note_url
+        }
+    }
+
+
+async def process_single_feed_async(session, feed, workflow_execution_id):
     """
-    处理单个 feed，创建笔记并分析票务信息
-    
+    处理单个 feed，创建笔记并分析票务信息（异步版本）
+
     Args:
+        session: 共享的 aiohttp.ClientSession
         feed: feed 数据
         workflow_execution_id: 工作流执行 ID
-        
+
     Returns:
         dict: 包含处理结果的字典
     """
@@ -518,98 +880,86 @@ def process_single_feed(feed, workflow_execution_id):
         if not feed_id or not note_card:
             return {'success': False, 'reason': 'incomplete_data'}
         
-        # 使用锁保护数据库操作，防止并发写入冲突
-        with db_lock:
-            with app.app_context():
-                # 再次检查笔记是否已存在（双重检查锁定模式）
-                existing_note = db.session.get(Note, feed_id)
-                if existing_note:
-                    app.logger.info(f"笔记已存在，跳过: {feed_id}")
-                    return {'success': False, 'reason': 'already_exists', 'note_id': feed_id}
-                
-                # 构建笔记 URL
-                note_url = f"https://www.xiaohongshu.com/explore/{feed_id}"
-                
-                # 创建新笔记
-                note = Note(
-                    note_id=feed_id,
-                    description=note_card.get('displayTitle', ''),
-                    note_url=note_url,
-                    create_time=datetime.now()
-                )
-                db.session.add(note)
-                db.session.flush()  # 刷新，使其他事务可见
-                
-                app.logger.info(f"已保存笔记: {feed_id} - {note.description[:50]}")
-        
-        # 分析票务信息（在锁外进行，避免长时间持有锁）
-        ticket_info = analyze_ticket_content(note_card.get('displayTitle', ''))
+        ensure_db_writer()
+
+        # 构建笔记 URL
+        note_url = f"https://www.xiaohongshu.com/explore/{feed_id}"
+
+        # 基于缓存集合去重，避免每个 feed 一次 SELECT；加锁保证并发 worker 只有一个认领成功
+        with _known_ids_lock:
+            if feed_id in _known_note_ids:
+                already_exists = True
+            else:
+                _known_note_ids.add(feed_id)
+                already_exists = False
+        if already_exists:
+            app.logger.info(f"笔记已存在，跳过: {feed_id}")
+            return {'success': False, 'reason': 'already_exists', 'note_id': feed_id}
+
+        description = note_card.get('displayTitle', '')
+
+        # 笔记交给写入线程批量落库
+        write_queue.put({
+            'type': 'note',
+            'data': {
+                'note_id': feed_id,
+                'description': description,
+                'note_url': note_url,
+                'create_time': datetime.now()
+            }
+        })
+
+        app.logger.info(f"已提交笔记入库: {feed_id} - {description[:50]}")
+
+        # AI 分析在事务外进行，不占用数据库写锁
+        ticket_info = await analyze_ticket_content_async(session, description)
         app.logger.info(f"票务分析结果: {ticket_info.get('is_ticket_resale')} - {ticket_info.get('event_name', 'N/A')}")
-        
-        if ticket_info.get('is_ticket_resale'):
-            # 使用锁保护票务信息写入
-            with db_lock:
-                with app.app_context():
-                    # 检查该笔记是否已有票务信息
-                    existing_ticket = Ticket.query.filter_by(note_id=feed_id).first()
-                    if existing_ticket:
-                        app.logger.warning(f"票务信息已存在，跳过: {feed_id}")
-                        return {'success': False, 'reason': 'ticket_exists', 'note_id': feed_id}
-                    
-                    # 创建票务信息
-                    ticket = Ticket(
-                        note_id=feed_id,
-                        is_ticket_resale=ticket_info.get('is_ticket_resale', True),
-                        event_name=ticket_info.get('event_name', ''),
-                        city=ticket_info.get('city', ''),
-                        event_date=datetime.strptime(ticket_info['event_date'], '%Y-%m-%d').date()
-                        if ticket_info.get('event_date') else None,
-                        area=ticket_info.get('area', ''),
-                        price=ticket_info.get('price', ''),
-                        quantity=ticket_info.get('quantity', ''),
-                        contact=ticket_info.get('contact', ''),
-                        notes=ticket_info.get('notes', '')
-                    )
-                    db.session.add(ticket)
-                    db.session.commit()
-                    
-                    app.logger.info(f"已保存票务: {ticket.event_name} - {ticket.city}")
-                    
-                    return {
-                        'success': True,
-                        'is_ticket': True,
-                        'ticket': {
-                            'event_name': ticket.event_name,
-                            'city': ticket.city,
-                            'event_date': ticket.event_date.strftime('%Y-%m-%d') if ticket.event_date else None,
-                            'price': ticket.price,
-                            'area': ticket.area,
-                            'quantity': ticket.quantity,
-                            'contact': ticket.contact,
-                            'notes': ticket.notes,
-                            'note_url': note_url
-                        }
-                    }
-        else:
-            # 提交笔记（非票务信息）
-            with db_lock:
-                with app.app_context():
-                    db.session.commit()
-            return {'success': True, 'is_ticket': False, 'note_id': feed_id}
-                
+
+        return _record_ticket_result(feed_id, note_url, ticket_info)
+
     except Exception as e:
         app.logger.error(f"处理 feed 失败: {str(e)}")
         import traceback
         app.logger.error(traceback.format_exc())
-        # 回滚事务
-        try:
-            with app.app_context():
-                db.session.rollback()
-        except:
-            pass
+        # worker 不再持有数据库会话，事务回滚由写入线程自理，无需推入应用上下文
         return {'success': False, 'reason': 'error', 'error': str(e)}
 
 
+async def _process_feeds_async(feeds, workflow_execution_id, on_result=None):
+    """
+    并发处理一批 feeds，AI 调用数量由信号量限制
+
+    Args:
+        feeds: feed 列表
+        workflow_execution_id: 工作流执行 ID
+        on_result: 可选回调，每个 feed 处理完成时调用
+
+    Returns:
+        list: 各个 feed 的处理结果
+    """
+    semaphore = asyncio.Semaphore(AI_CONCURRENCY)
+    results = []
+
+    async with aiohttp.ClientSession() as session:
+
+        async def _bounded(feed):
+            async with semaphore:
+                return await process_single_feed_async(session, feed, workflow_execution_id)
+
+        tasks = [asyncio.ensure_future(_bounded(feed)) for feed in feeds]
+        for future in asyncio.as_completed(tasks):
+            try:
+                result = await future
+            except Exception as e:
+                app.logger.error(f"处理笔记失败: {str(e)}")
+                result = {'success': False, 'reason': 'error', 'error': str(e)}
+            results.append(result)
+            if on_result:
+                on_result(result)
+
+    return results
+
+
 def execute_search_task(keyword):
     """执行搜索任务"""
     app.logger.info(f"开始执行搜索任务，原始关键词: {keyword}")
@@ -650,10 +1000,9 @@ def execute_search_task(keyword):
         # 第二步：调用小红书 MCP 服务
         app.logger.info("开始调用小红书 MCP 服务")
         
-        # 调用小红书 MCP 服务（使用优化后的关键词）
+        # 调用小红书 MCP 服务（使用优化后的关键词，复用共享客户端）
         try:
-            with XiaohongshuMCPClient(app.config['MCP_XIAOHONGSHU_URL']) as client:
-                feeds = client.search_feeds(optimized_keyword, sort_by="最新")
+            feeds = mcp_search_feeds(optimized_keyword, sort_by="最新")
         except Exception as e:
             app.logger.error(f"调用 MCP 服务失败: {str(e)}")
             workflow_execution.status = 'failed'
@@ -682,43 +1031,31 @@ def execute_search_task(keyword):
         processed_notes = 0
         ticket_count = 0
         
-        app.logger.info(f"开始并发处理 {total_notes} 条笔记数据（并发数：5）")
-        
-        # 使用线程池实现5并发处理
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            # 提交所有任务
-            future_to_feed = {
-                executor.submit(process_single_feed, feed, workflow_execution.id): feed 
-                for feed in feeds
-            }
-            
-            # 处理完成的任务
-            for future in as_completed(future_to_feed):
-                processed_notes += 1
-                
-                try:
-                    result = future.result()
-                    
-                    if result.get('success') and result.get('is_ticket'):
-                        ticket_count += 1
-                        # 通知客户端新票务信息
-                        notify_clients('ticket_update', {
-                            'task_id': workflow_execution.id,
-                            'ticket': result['ticket']
-                        })
-                        app.logger.info(f"发现票务信息 ({ticket_count}): {result['ticket']['event_name']}")
-                    
-                    # 更新任务状态，显示处理进度
-                    if processed_notes % 5 == 0 or processed_notes == total_notes:
-                        notify_clients('task_update', {
-                            'task_id': workflow_execution.id,
-                            'status': 'running',
-                            'message': f'已处理 {processed_notes}/{total_notes} 条数据，发现 {ticket_count} 条票务'
-                        })
-                        
-                except Exception as e:
-                    app.logger.error(f"处理任务结果时出错: {str(e)}")
-                    continue
+        app.logger.info(f"开始并发处理 {total_notes} 条笔记数据（并发数：{AI_CONCURRENCY}）")
+
+        # 使用 asyncio 并发处理，单个事件循环承载所有 AI 调用
+        def _on_feed_result(result):
+            nonlocal processed_notes, ticket_count
+            processed_notes += 1
+
+            if result.get('success') and result.get('is_ticket'):
+                ticket_count += 1
+                # 通知客户端新票务信息
+                notify_clients('ticket_update', {
+                    'task_id': workflow_execution.id,
+                    'ticket': result['ticket']
+                })
+                app.logger.info(f"发现票务信息 ({ticket_count}): {result['ticket']['event_name']}")
+
+            # 更新任务状态，显示处理进度
+            if processed_notes % 5 == 0 or processed_notes == total_notes:
+                notify_clients('task_update', {
+                    'task_id': workflow_execution.id,
+                    'status': 'running',
+                    'message': f'已处理 {processed_notes}/{total_notes} 条数据，发现 {ticket_count} 条票务'
+                })
+
+        run_feed_pipeline(_process_feeds_batched(feeds, workflow_execution.id, _on_feed_result))
         
         app.logger.info(f"并发处理完成，共处理 {total_notes} 条，发现 {ticket_count} 条票务信息")
         
@@ -778,30 +1115,48 @@ def get_tickets():
     """获取票务信息API"""
     try:
         task_id = request.args.get('task_id')
-        query = Ticket.query.join(Note)
-        
+        # 只取响应需要的列：一条窄查询同时带出 note_url，
+        # 不物化完整 ORM 对象，也不触发 .note 的懒加载
+        query = db.session.query(
+            Ticket.id,
+            Ticket.event_name,
+            Ticket.city,
+            Ticket.event_date,
+            Ticket.area,
+            Ticket.price,
+            Ticket.quantity,
+            Ticket.contact,
+            Ticket.notes,
+            Ticket.created_at,
+            Note.note_url
+        ).join(Note, Ticket.note_id == Note.note_id)
+
         if task_id:
-            task = WorkflowExecution.query.get(task_id)
-            if task and task.created_at:
-                query = query.filter(Ticket.created_at >= task.created_at)
-        
-        tickets = query.order_by(Ticket.created_at.desc()).limit(50).all()
-        return jsonify([{
-            'id': t.id,
-            'event_name': t.event_name,
-            'city': t.city,
-            'event_date': t.event_date.strftime('%Y-%m-%d') if t.event_date else None,
-            'area': t.area,
-            'price': t.price,
-            'quantity': t.quantity,
-            'contact': t.contact,
-            'notes': t.notes,
-            'note_url': t.note.note_url if t.note else None,
-            'created_at': t.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        } for t in tickets])
+            # 用标量子查询内联任务创建时间，单次往返完成过滤
+            task_created_at = db.session.query(WorkflowExecution.created_at).filter(
+                WorkflowExecution.id == task_id
+            ).scalar_subquery()
+            query = query.filter(Ticket.created_at >= task_created_at)
+
+        rows = query.order_by(Ticket.created_at.desc()).limit(50).all()
+        # date/datetime 直接交给 orjson 原生序列化，中文不再转义成 \uXXXX
+        payload = [{
+            'id': r.id,
+            'event_name': r.event_name,
+            'city': r.city,
+            'event_date': r.event_date,
+            'area': r.area,
+            'price': r.price,
+            'quantity': r.quantity,
+            'contact': r.contact,
+            'notes': r.notes,
+            'note_url': r.note_url,
+            'created_at': r.created_at
+        } for r in rows]
+        return Response(orjson.dumps(payload, default=str), mimetype='application/json')
     except Exception as e:
         app.logger.error(f"获取票务信息失败: {str(e)}")
-        return jsonify([])
+        return Response(b'[]', mimetype='application/json')
 
 @app.route('/api/monitor/start', methods=['POST'])
 @login_required
@@ -849,24 +1204,58 @@ def remove_monitor_keyword():
 def stream():
     """事件流接口"""
     def event_stream():
+        # 为当前客户端注册独立队列和 task_update 合并表
+        dq = deque(maxlen=SSE_CLIENT_QUEUE_SIZE)
+        task_state = {}
+        ev = threading.Event()
+        client = (dq, task_state, ev)
+        with _sse_clients_lock:
+            _sse_clients.append(client)
+
         try:
+            last_sent = time.monotonic()
             while True:
-                try:
-                    # 每30秒发送一次心跳包
-                    message = event_queue.get(timeout=30)
-                    if message:
-                        yield f"data: {json.dumps(message)}\n\n"
-                except Empty:
-                    # 发送心跳包保持连接
+                # 以 200ms 为刷新粒度，窗口内同一任务的多条状态只发最新一条
+                if ev.wait(timeout=SSE_FLUSH_INTERVAL):
+                    ev.clear()
+                sent = False
+                # 即时事件（ticket_update 等）原样下发
+                while dq:
+                    message = dq.popleft()
+                    yield f"data: {json.dumps(message)}\n\n"
+                    sent = True
+                # 合并后的任务状态：每个 task_id 一条；
+                # 同一窗口攒下多个任务时打包成一个批量事件，减少 socket 写次数
+                with _sse_clients_lock:
+                    states = list(task_state.values())
+                    task_state.clear()
+                if len(states) > 1:
+                    batch = {
+                        'type': 'task_update_batch',
+                        'data': [m['data'] for m in states],
+                        'timestamp': datetime.now().isoformat()
+                    }
+                    yield f"data: {json.dumps(batch)}\n\n"
+                    sent = True
+                elif states:
+                    yield f"data: {json.dumps(states[0])}\n\n"
+                    sent = True
+                if sent:
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent >= SSE_HEARTBEAT_INTERVAL:
+                    # 长时间无消息则发送心跳包保持连接
                     yield ": heartbeat\n\n"
-                    continue
-                except Exception as e:
-                    app.logger.error(f"事件流处理错误: {str(e)}")
-                    break
+                    last_sent = time.monotonic()
         except GeneratorExit:
             app.logger.info("客户端断开连接")
         except Exception as e:
             app.logger.error(f"事件流发生错误: {str(e)}")
+        finally:
+            with _sse_clients_lock:
+                try:
+                    _sse_clients.remove(client)
+                except ValueError:
+                    pass
     
     return Response(
         stream_with_context(event_stream()),
@@ -879,13 +1268,24 @@ def stream():
     )
 
 def notify_clients(event_type, data):
-    """向所有连接的客户端发送事件"""
+    """向所有连接的客户端广播事件（非阻塞，慢客户端自动丢弃最旧消息）"""
     message = {
         'type': event_type,
         'data': data,
         'timestamp': datetime.now().isoformat()
     }
-    event_queue.put(message)
+    coalesce = event_type == 'task_update' and isinstance(data, dict) and 'task_id' in data
+    with _sse_clients_lock:
+        clients = list(_sse_clients)
+        if coalesce:
+            # task_update 只保留每个任务的最新状态，由生成器统一刷新
+            for _, task_state, _ in clients:
+                task_state[data['task_id']] = message
+    if not coalesce:
+        for dq, _, _ in clients:
+            dq.append(message)
+    for _, _, ev in clients:
+        ev.set()
 
 @app.route('/tasks', methods=['GET'])
 def get_tasks():
@@ -981,32 +1381,39 @@ def delete_task(task_id):
             # 获取任务创建时间，用于查找相关数据
             task_created_at = workflow_execution.created_at
             
-            # 查找在任务创建时间之后创建的票务信息
-            tickets = Ticket.query.join(Note).filter(
+            # 只查 (id, note_id) 两列，单次扫描同时拿到两类待删 ID，
+            # 不物化整行票务对象
+            rows = db.session.query(Ticket.id, Ticket.note_id).filter(
                 Ticket.created_at >= task_created_at
             ).all()
-            
-            # 收集所有相关的note_ids
-            note_ids = set(ticket.note_id for ticket in tickets)
-            
-            # 删除票务信息
-            for ticket in tickets:
-                db.session.delete(ticket)
-            
-            # 删除相关的笔记
-            for note_id in note_ids:
-                note = Note.query.get(note_id)
-                if note:
-                    db.session.delete(note)
-            
+            ticket_ids = [r[0] for r in rows]
+            note_ids = {r[1] for r in rows}
+
+            # 批量删除票务信息和相关笔记：两条 DELETE 语句代替逐行 ORM 删除，
+            # 票务按主键删，避免重复跑一遍 created_at 范围过滤
+            db.session.query(Ticket).filter(
+                Ticket.id.in_(ticket_ids)
+            ).delete(synchronize_session=False)
+            db.session.query(Note).filter(
+                Note.note_id.in_(list(note_ids))
+            ).delete(synchronize_session=False)
+
+
             # 删除任务记录
             if workflow_execution.status == 'running':
                 workflow_execution.status = 'stopped'
             db.session.delete(workflow_execution)
             
-            # 提交所有更改
+            # 提交所有更改，并清空 identity map（bulk delete 不同步会话，
+            # 避免残留已删除对象的引用撑大内存）
             db.session.commit()
-            
+            db.session.expunge_all()
+
+            # 同步维护缓存集合，保证后续搜索可以重新收录这些笔记
+            with _known_ids_lock:
+                _known_note_ids.difference_update(note_ids)
+                _known_ticket_note_ids.difference_update(note_ids)
+
             # 通知客户端
             notify_clients('task_update', {'task_id': task_id, 'action': 'deleted'})
             return jsonify({'success': True, 'message': '任务及相关数据已删除'})
@@ -1037,17 +1444,25 @@ def main():
     """主函数"""
     logger.info("开始启动TicketHunter服务...")
     
-    # 初始化数据库
+    # 初始化数据库（建表之外还要建 FTS 索引，直接 create_all 会漏掉）
     with app.app_context():
-        db.create_all()
+        init_db()
     
+    # 启动数据库写入线程
+    ensure_db_writer()
+
     # 启动监控服务
     monitor.start()
     logger.info("定时任务监控服务已启动")
     
-    # 启动服务
+    # 直接运行走 Flask 自带的多线程开发服务器。gevent 必须在进程最开始
+    # monkey.patch_all() 才有用——没打补丁就起 gevent.pywsgi 的话，
+    # SSE 生成器里的 threading.Event.wait 会钉死唯一的 OS 线程，
+    # 第一个 /stream 连接就能挂起整个服务。
+    # 生产部署请用 wsgi.py + gunicorn -k gevent（见 Procfile）
     try:
-        app.run(host='0.0.0.0', port=8888, debug=app.config['DEBUG'])
+        logger.info("服务监听 0.0.0.0:8888")
+        app.run(host='0.0.0.0', port=8888, threaded=True)
     except Exception as e:
         logger.error(f"Flask应用启动失败: {str(e)}")
         sys.exit(1)
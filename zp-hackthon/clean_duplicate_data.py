@@ -24,26 +24,22 @@ def clean_duplicate_tickets():
         if not duplicate_notes:
             print("✅ 没有发现重复的票务数据")
             return
-        
+
         print(f"发现 {len(duplicate_notes)} 个笔记有重复票务信息：")
-        
-        total_deleted = 0
         for note_id, count in duplicate_notes:
-            print(f"\n笔记 ID: {note_id}, 重复数量: {count}")
-            
-            # 获取该笔记的所有票务信息
-            tickets = Ticket.query.filter_by(note_id=note_id).order_by(Ticket.created_at.asc()).all()
-            
-            # 保留第一条，删除其他的
-            keep_ticket = tickets[0]
-            print(f"  保留: ID={keep_ticket.id}, 演出={keep_ticket.event_name}, 创建时间={keep_ticket.created_at}")
-            
-            for ticket in tickets[1:]:
-                print(f"  删除: ID={ticket.id}, 演出={ticket.event_name}, 创建时间={ticket.created_at}")
-                db.session.delete(ticket)
-                total_deleted += 1
-        
+            print(f"  笔记 ID: {note_id}, 重复数量: {count}")
+
+        # 每个 note_id 保留 id 最小的一条（即最早入库的），
+        # 其余重复记录用一条 DELETE 语句删完，避免逐行删除的往返开销
+        keep_ids = db.session.query(
+            func.min(Ticket.id)
+        ).group_by(Ticket.note_id).scalar_subquery()
+        total_deleted = Ticket.query.filter(
+            Ticket.id.notin_(keep_ids)
+        ).delete(synchronize_session=False)
         db.session.commit()
+        # 脚本场景下主动释放会话，清掉 identity map 引用
+        db.session.close()
         print(f"\n✅ 清理完成！共删除 {total_deleted} 条重复数据")
 
 
@@ -54,20 +50,22 @@ def show_database_stats():
         print("数据库统计信息")
         print("="*60)
         
-        note_count = Note.query.count()
-        ticket_count = Ticket.query.count()
-        
+        # 三个统计量通过标量子查询合并成一次往返
+        duplicated = db.select(func.count()).select_from(
+            db.select(Ticket.note_id).group_by(Ticket.note_id)
+            .having(func.count(Ticket.id) > 1).subquery()
+        ).scalar_subquery()
+        note_count, ticket_count, duplicate_count = db.session.execute(db.select(
+            db.select(func.count(Note.note_id)).scalar_subquery(),
+            db.select(func.count(Ticket.id)).scalar_subquery(),
+            duplicated,
+        )).one()
+
         print(f"笔记总数: {note_count}")
         print(f"票务总数: {ticket_count}")
-        
-        # 查找有多个票务的笔记
-        duplicate_notes = db.session.query(
-            Ticket.note_id,
-            func.count(Ticket.id).label('count')
-        ).group_by(Ticket.note_id).having(func.count(Ticket.id) > 1).all()
-        
-        if duplicate_notes:
-            print(f"\n⚠️  有重复票务的笔记: {len(duplicate_notes)}")
+
+        if duplicate_count:
+            print(f"\n⚠️  有重复票务的笔记: {duplicate_count}")
         else:
             print(f"\n✅ 没有重复票务")
         
@@ -90,11 +88,15 @@ def clear_all_data():
             print("已取消")
             return
         
-        ticket_count = Ticket.query.count()
-        note_count = Note.query.count()
-        
-        Ticket.query.delete()
-        Note.query.delete()
+        # 一次往返取两个计数
+        ticket_count, note_count = db.session.execute(db.select(
+            db.select(func.count(Ticket.id)).scalar_subquery(),
+            db.select(func.count(Note.note_id)).scalar_subquery(),
+        )).one()
+
+        # 表级 DELETE，跳过 ORM 的对象加载和级联处理，单事务提交
+        db.session.execute(db.delete(Ticket))
+        db.session.execute(db.delete(Note))
         db.session.commit()
         
         print(f"✅ 已删除 {ticket_count} 条票务信息和 {note_count} 条笔记")
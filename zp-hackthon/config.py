@@ -6,6 +6,17 @@ class Config:
     # 数据库配置
     SQLALCHEMY_DATABASE_URI = 'sqlite:///tickethunter.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # 连接池配置：复用连接避免每个请求重新建连，pre_ping 剔除失效连接
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 20,
+        'max_overflow': 40,
+        'pool_pre_ping': True,
+        'pool_recycle': 3600,
+        'connect_args': {
+            'check_same_thread': False,  # 连接允许跨线程使用（监控线程 + 请求线程）
+            'timeout': 30,
+        },
+    }
     
     # 大模型API配置-智谱
     ZHIPU_API_KEY = 'be4d3127355e4363a4fc8fdab68e1b87.IXrJwhSFGyj47Bhu' #需要填写你的智谱api
@@ -39,4 +50,6 @@ class DevelopmentConfig(Config):
 class ProductionConfig(Config):
     DEBUG = False
     LOG_LEVEL = 'WARNING'
-    MONITOR_INTERVAL = 600  # 10分钟 
\ No newline at end of file
+    MONITOR_INTERVAL = 600  # 10分钟
+    # 生产环境并发更高（后续迁移 Postgres 时同样适用）
+    SQLALCHEMY_ENGINE_OPTIONS = dict(Config.SQLALCHEMY_ENGINE_OPTIONS, pool_size=50) 
\ No newline at end of file
@@ -1,13 +1,102 @@
+import sqlite3
+
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy import event, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex, CreateTable
 
 db = SQLAlchemy()
 
+
+@event.listens_for(Engine, "connect")
+def _set_sqlite_pragma(dbapi_connection, connection_record):
+    """为 SQLite 连接启用 WAL 模式并调优缓存，允许读写并发，写锁竞争交给 busy_timeout 处理"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA cache_size=-64000")       # 64MB 页缓存
+    cursor.execute("PRAGMA mmap_size=268435456")     # 256MB mmap 读路径
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    # SQLite 默认不检查外键，打开后 ON DELETE CASCADE 才会生效
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+# tickets 表的 FTS5 全文索引：search_tickets 的 MATCH 查询走倒排索引，
+# 触发器保证与主表同步（外部内容表，不重复存储正文）。
+# 默认的 unicode61 分词器不切分中文——整段中文是一个词元，子串查询
+# 永远 MATCH 不到；trigram 分词器（SQLite >= 3.34）按三字符滑窗建索引，
+# 对中文给出子串匹配语义
+_FTS_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS tickets_fts USING fts5(
+        event_name, area, notes, content='tickets', content_rowid='id',
+        tokenize='trigram')""",
+    """CREATE TRIGGER IF NOT EXISTS tickets_fts_ai AFTER INSERT ON tickets BEGIN
+        INSERT INTO tickets_fts(rowid, event_name, area, notes)
+        VALUES (new.id, new.event_name, new.area, new.notes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tickets_fts_ad AFTER DELETE ON tickets BEGIN
+        INSERT INTO tickets_fts(tickets_fts, rowid, event_name, area, notes)
+        VALUES ('delete', old.id, old.event_name, old.area, old.notes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tickets_fts_au AFTER UPDATE ON tickets BEGIN
+        INSERT INTO tickets_fts(tickets_fts, rowid, event_name, area, notes)
+        VALUES ('delete', old.id, old.event_name, old.area, old.notes);
+        INSERT INTO tickets_fts(rowid, event_name, area, notes)
+        VALUES (new.id, new.event_name, new.area, new.notes);
+    END""",
+]
+
+
+def _drop_fts():
+    """删掉 FTS 虚拟表和同步触发器（触发器引用虚拟表，必须一起删）"""
+    for trg in ('tickets_fts_ai', 'tickets_fts_ad', 'tickets_fts_au'):
+        db.session.execute(text(f"DROP TRIGGER IF EXISTS {trg}"))
+    db.session.execute(text("DROP TABLE IF EXISTS tickets_fts"))
+    db.session.commit()
+
+
+def _create_fts():
+    """创建 FTS5 虚拟表和同步触发器；首次创建时回填主表已有数据"""
+    row = db.session.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name='tickets_fts'"
+    )).first()
+    if row is not None and 'trigram' not in (row[0] or ''):
+        # 早期版本用默认分词器建的表搜不到中文子串，只能删掉重建
+        _drop_fts()
+        row = None
+    existed = row is not None
+    try:
+        for stmt in _FTS_SCHEMA:
+            db.session.execute(text(stmt))
+    except Exception:
+        # SQLite < 3.34 没有 trigram 分词器：放弃 FTS（查询会走 LIKE 回退），
+        # 把可能已建出的残留清理干净，避免触发器引用不存在的表
+        db.session.rollback()
+        _drop_fts()
+        return
+    if not existed:
+        # 外部内容表建好时是空的，rebuild 命令从 tickets 重建整个倒排索引，
+        # 否则旧库里已有的票务记录永远搜不到
+        db.session.execute(text("INSERT INTO tickets_fts(tickets_fts) VALUES('rebuild')"))
+    db.session.commit()
+
+
+def _fts_phrase(query):
+    """把用户输入转义成 FTS5 短语查询，避免特殊字符触发语法错误"""
+    return '"' + query.replace('"', '""') + '"'
+
+
 def init_app(app):
     """初始化数据库应用"""
     db.init_app(app)
     with app.app_context():
         db.create_all()
+        _create_fts()
 
 class Note(db.Model):
     """社交媒体笔记表"""
@@ -16,28 +105,39 @@ class Note(db.Model):
     note_id = db.Column(db.String(50), primary_key=True)
     description = db.Column(db.Text)
     note_url = db.Column(db.String(255))
-    create_time = db.Column(db.DateTime)
+    create_time = db.Column(db.DateTime, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # 关联票务信息
-    tickets = db.relationship('Ticket', backref='note', lazy=True)
+    # 关联票务信息：级联删除交给数据库执行，ORM 删除 Note 时不再逐条加载子记录
+    tickets = db.relationship('Ticket', backref='note', lazy=True,
+                              passive_deletes=True, cascade='all, delete-orphan')
 
 class Ticket(db.Model):
     """票务信息表"""
     __tablename__ = 'tickets'
-    
+    __table_args__ = (
+        # /api/tickets 按 created_at 过滤 + 关联 note 的覆盖索引
+        db.Index('ix_ticket_created_note', 'created_at', 'note_id'),
+        # filter_by(note_id) + order_by(created_at) 的组合查询
+        db.Index('ix_ticket_noteid_created', 'note_id', 'created_at'),
+        # 一条笔记只保留一条票务记录，save_ticket_info 的 UPSERT 以此为冲突键。
+        # 用独立的唯一索引而不是表级约束：旧表加不了约束，
+        # 但 _ensure_indexes 可以在清掉重复行之后把唯一索引补上
+        db.Index('uq_ticket_note_id', 'note_id', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    note_id = db.Column(db.String(50), db.ForeignKey('notes.note_id'))
+    note_id = db.Column(db.String(50), db.ForeignKey('notes.note_id', ondelete='CASCADE'), index=True)
     is_ticket_resale = db.Column(db.Boolean, default=True)
     event_name = db.Column(db.String(100))
     city = db.Column(db.String(50))
-    event_date = db.Column(db.Date)
+    event_date = db.Column(db.Date, index=True)
     area = db.Column(db.String(50))
     price = db.Column(db.String(100))
     quantity = db.Column(db.String(50))
     contact = db.Column(db.String(100))
     notes = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
 class WorkflowExecution(db.Model):
     """工作流执行记录表"""
@@ -56,43 +156,132 @@ class WorkflowExecution(db.Model):
     is_scheduled = db.Column(db.Boolean, default=True)  # 是否启用定时任务
     schedule_interval = db.Column(db.Integer, default=60)  # 定时间隔（秒）
     last_run_at = db.Column(db.DateTime)  # 上次执行时间
-    next_run_at = db.Column(db.DateTime)  # 下次执行时间
+    next_run_at = db.Column(db.DateTime, index=True)  # 下次执行时间（调度 tick 按此扫描）
     run_count = db.Column(db.Integer, default=0)  # 执行次数
 
+def _dedupe_tickets():
+    """清掉旧库里同一 note_id 的重复票务记录（保留最早一条）
+
+    唯一索引建立之前写入的重复行会让 CREATE UNIQUE INDEX 失败，
+    必须先清理；索引建好之后这里就是一条空 DELETE
+    """
+    db.session.execute(text(
+        "DELETE FROM tickets WHERE id NOT IN "
+        "(SELECT MIN(id) FROM tickets GROUP BY note_id)"
+    ))
+    db.session.commit()
+
+
+def _ensure_fk_cascade():
+    """给旧库 tickets 的外键补上 ON DELETE CASCADE
+
+    create_all 不会改已有表，而 PRAGMA foreign_keys 打开后，旧外键
+    没有级联规则，删除还有票务记录的 Note 会直接报 IntegrityError。
+    SQLite 不支持改外键，按官方推荐流程重建表：建新表、拷数据、
+    删旧表、改名（索引和触发器随旧表一起删除，init_db 后续步骤会重建）
+    """
+    fks = db.session.execute(text("PRAGMA foreign_key_list('tickets')")).mappings().all()
+    if any(fk['table'] == 'notes' and (fk['on_delete'] or '').upper() == 'CASCADE'
+           for fk in fks):
+        return
+    db.session.remove()
+
+    # 新表 DDL 以模型为准生成，换个名字建出来再改回去
+    ddl = str(CreateTable(Ticket.__table__).compile(db.engine)).replace(
+        'CREATE TABLE tickets ', 'CREATE TABLE tickets_rebuild ', 1)
+    cols = ', '.join(c.name for c in Ticket.__table__.columns)
+
+    # 重建期间要关掉外键检查，PRAGMA 在事务里不生效，走 AUTOCOMMIT 连接
+    with db.engine.connect() as conn:
+        conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+        conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        conn.exec_driver_sql("BEGIN")
+        try:
+            conn.exec_driver_sql(ddl)
+            conn.exec_driver_sql(
+                f"INSERT INTO tickets_rebuild ({cols}) SELECT {cols} FROM tickets")
+            conn.exec_driver_sql("DROP TABLE tickets")
+            conn.exec_driver_sql("ALTER TABLE tickets_rebuild RENAME TO tickets")
+            conn.exec_driver_sql("COMMIT")
+        except Exception:
+            conn.exec_driver_sql("ROLLBACK")
+            raise
+        conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+
+
+def _ensure_indexes():
+    """为已有的旧表补建模型里声明的索引
+
+    create_all 只建新表，不会给已存在的表加索引；没有这一步，
+    旧库上 created_at / next_run_at 等过滤仍然是全表扫描
+    """
+    for table in db.metadata.tables.values():
+        for index in table.indexes:
+            db.session.execute(CreateIndex(index, if_not_exists=True))
+    db.session.commit()
+
+
 def init_db():
-    """初始化数据库表"""
+    """初始化数据库表，并为旧库补齐模型新增的索引和 FTS（全部幂等）"""
     db.create_all()
+    _dedupe_tickets()
+    _ensure_fk_cascade()
+    _ensure_indexes()
+    _create_fts()
 
 def save_note(note_data):
-    """保存社交媒体笔记"""
-    note = Note.query.get(note_data['note_id'])
-    if note:
-        # 更新现有记录
-        for key, value in note_data.items():
-            setattr(note, key, value)
+    """保存社交媒体笔记（单条 UPSERT，插入或更新一次往返完成）"""
+    update_cols = {k: v for k, v in note_data.items() if k != 'note_id'}
+    stmt = sqlite_insert(Note).values(**note_data)
+    if update_cols:
+        stmt = stmt.on_conflict_do_update(index_elements=['note_id'], set_=update_cols)
     else:
-        # 创建新记录
-        note = Note(**note_data)
-        db.session.add(note)
-    
+        stmt = stmt.on_conflict_do_nothing(index_elements=['note_id'])
+    db.session.execute(stmt)
     db.session.commit()
-    return note
 
 def save_ticket_info(note_id, ticket_info):
-    """保存票务分析结果"""
-    ticket = Ticket.query.filter_by(note_id=note_id).first()
-    if ticket:
-        # 更新现有记录
-        for key, value in ticket_info.items():
-            setattr(ticket, key, value)
+    """保存票务分析结果（单条 UPSERT，按 note_id 冲突更新）"""
+    values = dict(ticket_info, note_id=note_id)
+    stmt = sqlite_insert(Ticket).values(**values)
+    if ticket_info:
+        stmt = stmt.on_conflict_do_update(index_elements=['note_id'], set_=dict(ticket_info))
     else:
-        # 创建新记录
-        ticket_info['note_id'] = note_id
-        ticket = Ticket(**ticket_info)
-        db.session.add(ticket)
-    
+        stmt = stmt.on_conflict_do_nothing(index_elements=['note_id'])
+    db.session.execute(stmt)
     db.session.commit()
-    return ticket
+
+# 批量写入分块大小：限制单条 SQL 的参数数量，避免超大批次撑爆语句
+BULK_CHUNK_SIZE = 1000
+
+def save_notes_bulk(notes_list, commit=True):
+    """批量保存笔记（分块 executemany，冲突行忽略）
+
+    commit=False 时由调用方统一提交，方便和其他写入合并为一个事务
+    """
+    if not notes_list:
+        return
+    # OR IGNORE 不依赖唯一索引存在（ON CONFLICT(note_id) 在没跑过迁移的
+    # 旧库上会直接报错），对任何约束冲突都静默跳过
+    stmt = sqlite_insert(Note).prefix_with('OR IGNORE')
+    for i in range(0, len(notes_list), BULK_CHUNK_SIZE):
+        db.session.execute(stmt, notes_list[i:i + BULK_CHUNK_SIZE])
+    if commit:
+        db.session.commit()
+
+def save_tickets_bulk(tickets_list, commit=True):
+    """批量保存票务信息（分块 executemany，按 note_id 冲突忽略）
+
+    commit=False 时由调用方统一提交，方便和其他写入合并为一个事务
+    """
+    if not tickets_list:
+        return
+    # 同 save_notes_bulk：OR IGNORE 不依赖唯一索引存在
+    stmt = sqlite_insert(Ticket).prefix_with('OR IGNORE')
+    for i in range(0, len(tickets_list), BULK_CHUNK_SIZE):
+        db.session.execute(stmt, tickets_list[i:i + BULK_CHUNK_SIZE])
+    if commit:
+        db.session.commit()
 
 def get_unprocessed_notes():
     """获取未处理的笔记"""
@@ -100,7 +289,18 @@ def get_unprocessed_notes():
     return Note.query.outerjoin(Ticket).filter(Ticket.id == None).all()
 
 def get_ticket_by_event(event_name):
-    """根据演出名称查询票务信息"""
+    """根据演出名称查询票务信息（FTS5 倒排索引，查不到时回退 LIKE 扫描）"""
+    try:
+        rows = db.session.query(Ticket).from_statement(text(
+            "SELECT t.* FROM tickets t JOIN tickets_fts f ON f.rowid = t.id "
+            "WHERE tickets_fts MATCH :q"
+        )).params(q='event_name:' + _fts_phrase(event_name)).all()
+    except Exception:
+        db.session.rollback()
+        rows = []
+    if rows:
+        return rows
+    # trigram 召不到的场景（查询不足 3 个字符、FTS 表缺失）退回 LIKE
     return Ticket.query.filter(Ticket.event_name.ilike(f'%{event_name}%')).all()
 
 def get_tickets_by_date_range(start_date, end_date):
@@ -115,7 +315,18 @@ def get_recent_tickets(limit=10):
     return Ticket.query.order_by(Ticket.created_at.desc()).limit(limit).all()
 
 def search_tickets(query):
-    """搜索票务信息"""
+    """搜索票务信息（FTS5 倒排索引，查不到时回退 LIKE 扫描）"""
+    try:
+        rows = db.session.query(Ticket).from_statement(text(
+            "SELECT t.* FROM tickets t JOIN tickets_fts f ON f.rowid = t.id "
+            "WHERE tickets_fts MATCH :q"
+        )).params(q=_fts_phrase(query)).all()
+    except Exception:
+        db.session.rollback()
+        rows = []
+    if rows:
+        return rows
+    # trigram 召不到的场景（查询不足 3 个字符、FTS 表缺失）退回 LIKE
     return Ticket.query.filter(
         db.or_(
             Ticket.event_name.ilike(f'%{query}%'),
@@ -9,6 +9,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import app, db
+from database import init_db
 
 def init_database():
     """初始化数据库"""
@@ -19,8 +20,8 @@ def init_database():
         db.drop_all()
         print("✅ 已删除旧表")
         
-        # 创建所有表
-        db.create_all()
+        # 创建所有表（含 FTS 全文索引）
+        init_db()
         print("✅ 已创建新表")
         
         # 验证表
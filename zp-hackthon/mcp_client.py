@@ -5,10 +5,11 @@ xiaohongshu-mcp 客户端封装
 使用直接 HTTP 请求方式连接到本地 MCP 服务
 """
 
-import json
 import logging
+import threading
 from typing import List, Dict, Any, Optional
-import requests
+import httpx
+import orjson
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +25,12 @@ class XiaohongshuMCPClient:
             mcp_url: MCP 服务的 URL
         """
         self.mcp_url = mcp_url
-        self.session = requests.Session()
+        # HTTP/2：并发的 JSON-RPC 调用在同一条连接上多路复用，
+        # 不用为每个并发调用单开 TCP+TLS
+        self.session = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=10)
+        )
         self.session_id: Optional[str] = None
         self._request_id = 0
         
@@ -153,16 +159,19 @@ class XiaohongshuMCPClient:
             
             # 发送请求
             logger.info("准备调用 search_feeds 工具...")
-            response = self.session.post(
+            # 流式请求：先拿到响应头就能校验状态码，正文在解码时才读入，
+            # 避免 raise_for_status 之前就把大 feed 列表整体缓冲一遍
+            with self.session.stream(
+                "POST",
                 self.mcp_url,
                 json=tool_payload,
                 headers=headers,
                 timeout=120  # 2分钟超时
-            )
-            response.raise_for_status()
-            
-            # 解析响应
-            result_data = response.json()
+            ) as response:
+                response.raise_for_status()
+
+                # 解析响应（orjson 直接解码字节，大响应体比标准库快数倍）
+                result_data = orjson.loads(response.read())
             
             if 'error' in result_data:
                 error_msg = result_data['error'].get('message', '未知错误')
@@ -182,7 +191,7 @@ class XiaohongshuMCPClient:
                     logger.info(f"收到响应内容长度: {len(text_content)}")
                     
                     # 解析 JSON
-                    response_data = json.loads(text_content)
+                    response_data = orjson.loads(text_content)
                     
                     # xiaohongshu-mcp 返回格式：{"feeds": [...], "count": N}
                     if isinstance(response_data, dict) and 'feeds' in response_data:
@@ -199,10 +208,11 @@ class XiaohongshuMCPClient:
             logger.warning("工具调用返回空结果")
             return []
                 
-        except json.JSONDecodeError as e:
+        except ValueError as e:
+            # orjson 解码失败抛 ValueError（JSONDecodeError 的父类）
             logger.error(f"解析 JSON 失败: {str(e)}")
             return []
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"HTTP 请求失败: {str(e)}")
             raise
         except Exception as e:
@@ -210,6 +220,34 @@ class XiaohongshuMCPClient:
             raise
 
 
+# 每个 MCP URL 一个共享客户端：initialize 握手只做一次，
+# 之后的搜索复用已建立的会话和连接池
+_shared_clients: Dict[str, XiaohongshuMCPClient] = {}
+_shared_clients_lock = threading.Lock()
+
+
+def get_shared_client(mcp_url: str = "http://localhost:18060/mcp") -> XiaohongshuMCPClient:
+    """获取指定 URL 的共享客户端（懒初始化，已握手）"""
+    with _shared_clients_lock:
+        client = _shared_clients.get(mcp_url)
+        if client is None:
+            client = XiaohongshuMCPClient(mcp_url)
+            client.connect()
+            _shared_clients[mcp_url] = client
+        return client
+
+
+def reset_shared_client(mcp_url: str = "http://localhost:18060/mcp"):
+    """丢弃失效的共享客户端，下次获取时重新握手"""
+    with _shared_clients_lock:
+        client = _shared_clients.pop(mcp_url, None)
+    if client is not None:
+        try:
+            client.disconnect()
+        except Exception:
+            pass
+
+
 # 便捷函数，用于快速搜索
 def search_xiaohongshu(
     keyword: str,
@@ -217,16 +255,21 @@ def search_xiaohongshu(
     **filters
 ) -> List[Dict[str, Any]]:
     """
-    快速搜索小红书内容（便捷函数）
-    
+    快速搜索小红书内容（便捷函数，复用共享会话，失效时重连一次后重试）
+
     Args:
         keyword: 搜索关键词
         mcp_url: MCP 服务地址
         **filters: 其他过滤参数（location, note_type, publish_time, search_scope, sort_by）
-        
+
     Returns:
         笔记列表（feeds 格式）
     """
-    with XiaohongshuMCPClient(mcp_url) as client:
+    client = get_shared_client(mcp_url)
+    try:
         return client.search_feeds(keyword, **filters)
+    except Exception as e:
+        logger.warning(f"MCP 调用失败，尝试重连: {str(e)}")
+        reset_shared_client(mcp_url)
+        return get_shared_client(mcp_url).search_feeds(keyword, **filters)
 
@@ -3,14 +3,19 @@
 """
 AI 提示词配置文件
 统一管理所有大模型提示词
+
+模板在导入时编译为 string.Template，热路径上的每次调用只做变量替换，
+不再重复解析 format 格式串（JSON 花括号也无需再转义）
 """
 
+from string import Template
+
 
 class Prompts:
     """AI 提示词配置类"""
-    
+
     # 关键词优化提示词
-    KEYWORD_OPTIMIZATION = """你是一个小红书搜索关键词优化助手。用户想在小红书上搜索演唱会、音乐会等演出的转让票务信息。
+    KEYWORD_OPTIMIZATION = Template("""你是一个小红书搜索关键词优化助手。用户想在小红书上搜索演唱会、音乐会等演出的转让票务信息。
 
 请分析用户输入的关键词，理解用户意图，并优化为最适合在小红书上搜索票务转让信息的关键词。
 
@@ -22,21 +27,21 @@ class Prompts:
 5. 如果是音乐节/展览，保留活动名称
 6. 简洁明了，便于搜索
 
-用户输入: {keyword}
+用户输入: $keyword
 
 请直接返回优化后的关键词，不要有任何解释说明。如果原关键词已经很好，可以直接返回。
 
-优化后的关键词:"""
+优化后的关键词:""")
 
     # 票务信息识别提示词
-    TICKET_ANALYSIS = """你是一个票务信息分析助手。请分析以下小红书笔记内容，判断对方是否有销售商品、演唱会门票的意向，并提取相关信息。
+    TICKET_ANALYSIS = Template("""你是一个票务信息分析助手。请分析以下小红书笔记内容，判断对方是否有销售商品、演唱会门票的意向，并提取相关信息。
 
 笔记内容：
-{content}
+$content
 
 请按照以下JSON格式返回结果（只返回JSON，不要其他说明）：
 
-{{
+{
     "is_ticket_resale": true/false,  // 是否为票务转让
     "event_name": "演出名称",
     "city": "城市",
@@ -46,7 +51,7 @@ class Prompts:
     "quantity": "数量",
     "contact": "联系方式",
     "notes": "其他备注"
-}}
+}
 
 判断规则：
 1. 包含"转让"、"出"、"求"等关键词
@@ -54,33 +59,79 @@ class Prompts:
 3. 包含价格信息
 4. 如果不是票务转让信息，is_ticket_resale 设为 false，其他字段可为空字符串
 
-请分析："""
+请分析：""")
+
+    # 批量票务信息识别提示词：一次请求分析多条笔记，摊薄 HTTP/TLS/prefill 开销
+    BATCH_TICKET_ANALYSIS = Template("""你是一个票务信息分析助手。请逐条分析以下 $count 条小红书笔记内容，判断每条是否有销售商品、演唱会门票的意向，并提取相关信息。
+
+笔记列表：
+$items
+
+请按照以下JSON格式返回结果（只返回JSON，不要其他说明），results 数组的长度和顺序必须与笔记列表一一对应：
+
+{
+    "results": [
+        {
+            "is_ticket_resale": true/false,  // 是否为票务转让
+            "event_name": "演出名称",
+            "city": "城市",
+            "event_date": "YYYY-MM-DD",  // 演出日期，格式为YYYY-MM-DD，若原文未给出，默认年份为2025年
+            "area": "座位区域",
+            "price": "价格",
+            "quantity": "数量",
+            "contact": "联系方式",
+            "notes": "其他备注"
+        }
+    ]
+}
+
+判断规则：
+1. 包含"转让"、"出"、"求"等关键词
+2. 提到演出/演唱会名称
+3. 包含价格信息
+4. 如果不是票务转让信息，is_ticket_resale 设为 false，其他字段可为空字符串
+
+请分析：""")
 
     @classmethod
     def get_keyword_optimization_prompt(cls, keyword: str) -> str:
         """
         获取关键词优化提示词
-        
+
         Args:
             keyword: 用户输入的原始关键词
-            
+
         Returns:
             格式化后的提示词
         """
-        return cls.KEYWORD_OPTIMIZATION.format(keyword=keyword)
-    
+        return cls.KEYWORD_OPTIMIZATION.substitute(keyword=keyword)
+
     @classmethod
     def get_ticket_analysis_prompt(cls, content: str) -> str:
         """
         获取票务信息分析提示词
-        
+
         Args:
             content: 笔记内容
-            
+
+        Returns:
+            格式化后的提示词
+        """
+        return cls.TICKET_ANALYSIS.substitute(content=content)
+
+    @classmethod
+    def get_batch_ticket_analysis_prompt(cls, descriptions) -> str:
+        """
+        获取批量票务信息分析提示词
+
+        Args:
+            descriptions: 笔记内容列表
+
         Returns:
             格式化后的提示词
         """
-        return cls.TICKET_ANALYSIS.format(content=content)
+        items = "\n".join(f"{i}. {desc}" for i, desc in enumerate(descriptions, 1))
+        return cls.BATCH_TICKET_ANALYSIS.substitute(count=len(descriptions), items=items)
 
 
 # 导出便捷函数
@@ -93,3 +144,7 @@ def get_ticket_analysis_prompt(content: str) -> str:
     """获取票务信息分析提示词"""
     return Prompts.get_ticket_analysis_prompt(content)
 
+
+def get_batch_ticket_analysis_prompt(descriptions) -> str:
+    """获取批量票务信息分析提示词"""
+    return Prompts.get_batch_ticket_analysis_prompt(descriptions)
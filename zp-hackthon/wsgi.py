@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+gunicorn + gevent 部署入口
+
+SSE 长连接在 gevent worker 下只是一个廉价的 greenlet，不会像开发服务器
+那样钉死一个工作线程。启动方式：
+
+    gunicorn -k gevent -w 2 --worker-connections 1000 -b 0.0.0.0:8888 wsgi:app
+"""
+
+# 必须在导入任何网络库之前打补丁
+from gevent import monkey
+monkey.patch_all()
+
+import fcntl
+
+from app import app, monitor, ensure_db_writer
+from database import init_db
+
+# 初始化数据库并启动后台服务（建表之外还要建 FTS 索引）
+with app.app_context():
+    init_db()
+
+# 写入线程每个 worker 都要有：各 worker 有自己的进程内写入队列，
+# 落库用 INSERT OR IGNORE，多进程并发写同一个库是安全的
+ensure_db_writer()
+
+# 调度器只能跑在一个 worker 里，否则 -w N 会把每个到期任务执行 N 次
+# （重复的 MCP/AI 调用、run_count 翻倍）。用文件锁选主：第一个拿到锁的
+# worker 启动调度器，锁随进程存活，worker 挂掉后自动释放
+_scheduler_lock = open('/tmp/tickethunter-scheduler.lock', 'w')
+try:
+    fcntl.flock(_scheduler_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+except OSError:
+    app.logger.info("调度器已在其他 worker 中运行，本 worker 只处理请求")
+else:
+    monitor.start()